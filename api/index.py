@@ -3,6 +3,7 @@
 """Vercel Python function: /api
 
 Simple QA dashboard. Uses Firestore counts to verify connectivity.
+Counts and rendered bodies are cached in-process for a short TTL.
 
 Env vars (set in Vercel):
 - FIREBASE_SERVICE_ACCOUNT_JSON (stringified JSON)
@@ -18,6 +19,9 @@ from __future__ import annotations
 
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from http.server import BaseHTTPRequestHandler
 from urllib.parse import parse_qs, urlparse
@@ -25,8 +29,29 @@ from urllib.parse import parse_qs, urlparse
 from google.oauth2 import service_account
 from google.cloud import firestore
 
+COUNTED_COLLECTIONS = {
+    "contacts": "ghl_contacts",
+    "opportunities": "ghl_opportunities",
+    "pipelines": "ghl_pipelines",
+    "users": "ghl_users",
+}
+
+# Shared across warm invocations; count() RPCs are network-bound so threads overlap.
+_EXECUTOR = ThreadPoolExecutor(max_workers=len(COUNTED_COLLECTIONS))
+
+_TTL_SECONDS = 25
+_CACHE: dict = {"ts": 0.0, "data": None, "json": b"", "html": b""}
+_CACHE_LOCK = threading.Lock()
+
+# Reused across warm invocations so credentials are parsed once per instance
+_DB: firestore.Client | None = None
+
 
 def get_db() -> firestore.Client:
+    global _DB
+    if _DB is not None:
+        return _DB
+
     creds_json = os.environ.get("FIREBASE_SERVICE_ACCOUNT_JSON")
     project_id = os.environ.get("GCP_PROJECT_ID")
     database_id = os.environ.get("FIRESTORE_DATABASE_ID")
@@ -41,7 +66,8 @@ def get_db() -> firestore.Client:
 
     creds_dict = json.loads(creds_json)
     creds = service_account.Credentials.from_service_account_info(creds_dict)
-    return firestore.Client(project=project_id, database=database_id, credentials=creds)
+    _DB = firestore.Client(project=project_id, database=database_id, credentials=creds)
+    return _DB
 
 
 def safe_count(db: firestore.Client, collection: str) -> int:
@@ -60,13 +86,31 @@ def safe_count(db: firestore.Client, collection: str) -> int:
 
 
 def build_stats(db: firestore.Client) -> dict:
-    return {
-        "contacts": safe_count(db, "ghl_contacts"),
-        "opportunities": safe_count(db, "ghl_opportunities"),
-        "pipelines": safe_count(db, "ghl_pipelines"),
-        "users": safe_count(db, "ghl_users"),
-        "generated_at": datetime.utcnow().isoformat() + "Z",
-    }
+    keys = list(COUNTED_COLLECTIONS)
+    counts = _EXECUTOR.map(lambda k: safe_count(db, COUNTED_COLLECTIONS[k]), keys)
+    stats: dict = dict(zip(keys, counts))
+    stats["generated_at"] = datetime.utcnow().isoformat() + "Z"
+    return stats
+
+
+def get_stats() -> dict:
+    """Return cached stats, refreshing at most once per TTL window."""
+    with _CACHE_LOCK:
+        if _CACHE["data"] is not None and time.monotonic() - _CACHE["ts"] < _TTL_SECONDS:
+            return _CACHE["data"]
+        stats = build_stats(get_db())
+        _CACHE["data"] = stats
+        # Render once per refresh so cache hits just write bytes
+        _CACHE["json"] = json.dumps(stats).encode("utf-8")
+        _CACHE["html"] = build_html(stats).encode("utf-8")
+        _CACHE["ts"] = time.monotonic()
+        return stats
+
+
+def get_body(want_json: bool) -> bytes:
+    """Return the pre-rendered response body for the cached stats."""
+    get_stats()
+    return _CACHE["json"] if want_json else _CACHE["html"]
 
 
 def build_html(stats: dict) -> str:
@@ -122,22 +166,19 @@ class Handler(BaseHTTPRequestHandler):
             qs = parse_qs(urlparse(self.path).query)
             want_json = qs.get("format", [""])[0].lower() == "json"
 
-            db = get_db()
-            stats = build_stats(db)
+            body = get_body(want_json)
 
             if want_json:
-                body = json.dumps(stats).encode("utf-8")
                 self.send_response(200)
                 self.send_header("Content-Type", "application/json")
-                self.send_header("Cache-Control", "no-store")
+                self.send_header("Cache-Control", f"public, max-age={_TTL_SECONDS}")
                 self.end_headers()
                 self.wfile.write(body)
                 return
 
-            body = build_html(stats).encode("utf-8")
             self.send_response(200)
             self.send_header("Content-Type", "text/html; charset=utf-8")
-            self.send_header("Cache-Control", "no-store")
+            self.send_header("Cache-Control", f"public, max-age={_TTL_SECONDS}")
             self.end_headers()
             self.wfile.write(body)
 
@@ -2,14 +2,27 @@
 Happy Solar - Kixie Call Center Dashboard
 Shows calls per agent with connections and connection rate
 """
+import atexit
 import os
-from dash import Dash, html, dcc, callback, Output, Input
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from dash import Dash, html, dcc, dash_table, callback, ctx, Output, Input
 import plotly.express as px
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
 from google.cloud import firestore
+from google.cloud.firestore_v1.watch import ChangeType
 from datetime import datetime, timedelta
 
+try:
+    import pyarrow  # noqa: F401  (optional: Arrow-backed string/int columns)
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
 SERVICE_ACCOUNT_PATH = os.path.join(os.path.dirname(__file__), 'firebase-key.json')
 
 # Initialize Firebase
@@ -20,21 +33,86 @@ except Exception as e:
     print(f"Firebase error: {e}")
     db = None
 
+# Fields the dashboard actually reads; everything else stays server-side
+CALL_FIELDS = ['agent', 'outcome', 'duration', 'callDate', 'phoneNumber', 'direction']
+
+# Low-cardinality string columns stored as pandas categoricals
+CATEGORY_FIELDS = ('agent', 'outcome', 'direction')
+
+# Free-text columns stored as Arrow strings when pyarrow is available
+ARROW_FIELDS = ['id', 'phoneNumber']
+
+# Connection = calls with outcome 'connected' or 'answered'
+CONNECTED_OUTCOMES = ['connected', 'answered', 'success']
+
+# Per-date-range cache of filtered calls for the agent breakdown; the TTL spans
+# several 30s auto-refresh ticks so a single viewer's ticks don't re-fetch
+CACHE_TTL_SECONDS = 120
+_range_lock = threading.Lock()
+_range_cache = {}
+
+# Live copy of kixie_calls maintained by a Firestore snapshot listener
+_calls_lock = threading.Lock()
+_live_calls = {}
+_live_dirty = False
+_first_snapshot = threading.Event()
+_calls_watch = None
+
+# In-flight Firestore fetches, so concurrent refreshes share one stream
+_fetch_lock = threading.Lock()
+_inflight = {}
+
+# Bumped whenever df is replaced, so cached figures know when to rebuild
+_df_version = 0
+
+
+def day_window(start, end):
+    """UTC [lo, hi) covering the inclusive [start, end] date range
+
+    This is the one definition of a dashboard day, shared by the Firestore
+    bounds and the in-memory slice: calendar days in UTC.
+    """
+    lo = pd.Timestamp(start).tz_localize('UTC')
+    hi = pd.Timestamp(end).tz_localize('UTC') + pd.Timedelta(days=1)
+    return lo, hi
+
+
+def date_bounds(start, end):
+    """Firestore string bounds for day_window (hi exclusive)
+
+    Assumes callDate is stored as a UTC ISO-8601 string ('Z', '+00:00' or
+    naive), which calls_frame() also parses as UTC. Bare YYYY-MM-DD bounds then
+    sit exactly on UTC midnight whether the stored value uses 'T' or a space.
+    Strings with other offsets, or Timestamp-typed callDate values, are not
+    matched by these string range filters.
+    """
+    lo, hi = day_window(start, end)
+    return lo.strftime('%Y-%m-%d'), hi.strftime('%Y-%m-%d')
+
+
+def calls_query(start, end):
+    """kixie_calls query with the date window pushed down to Firestore"""
+    query = db.collection('kixie_calls')
+    if start and end:
+        lo, hi = date_bounds(start, end)
+        query = query.where('callDate', '>=', lo).where('callDate', '<', hi)
+    return query
+
 
-def fetch_calls():
-    """Fetch all Kixie calls from Firestore"""
+def fetch_calls(start=None, end=None):
+    """Fetch Kixie calls from Firestore, optionally limited to a date window"""
+    return single_flight(('kixie_calls', start, end), lambda: _stream_calls(start, end))
+
+
+def _stream_calls(start, end):
     if not db:
         return pd.DataFrame()
     
     try:
-        docs = db.collection('kixie_calls').stream()
-        calls = []
-        for doc in docs:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            calls.append(data)
-        
-        df = pd.DataFrame(calls)
+        # stream() is a single server-streamed RunQuery RPC, not paged requests,
+        # so keeping the projection small is what cuts wire time here
+        docs = calls_query(start, end).select(CALL_FIELDS).stream()
+        df = calls_frame((doc.id, doc.to_dict()) for doc in docs)
         print(f"Loaded {len(df)} calls from Firestore")
         return df
     except Exception as e:
@@ -42,32 +120,143 @@ def fetch_calls():
         return pd.DataFrame()
 
 
+def single_flight(key, fn):
+    """Run fn once for concurrent callers with the same key; all of them share its result"""
+    with _fetch_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        return future.result()
+
+    try:
+        future.set_result(fn())
+    except Exception as e:
+        future.set_exception(e)
+    finally:
+        with _fetch_lock:
+            _inflight.pop(key, None)
+    return future.result()
+
+
+def calls_frame(records):
+    """Build the calls DataFrame from (doc id, fields) pairs"""
+    # Column lists (not row dicts) so pandas skips the per-row schema union
+    cols = {k: [] for k in ['id'] + CALL_FIELDS}
+    for doc_id, data in records:
+        cols['id'].append(doc_id)
+        for k in CALL_FIELDS:
+            cols[k].append(data.get(k))
+
+    df = pd.DataFrame(cols, copy=False)
+    df['duration'] = pd.to_numeric(df['duration'], errors='coerce', downcast='integer')
+    df['callDate'] = pd.to_datetime(df['callDate'], errors='coerce', utc=True, cache=True, format='ISO8601')
+    if HAS_PYARROW:
+        df[ARROW_FIELDS] = df[ARROW_FIELDS].convert_dtypes(dtype_backend='pyarrow')
+        # Durations aren't guaranteed integral (see api/kixie_duration_probe.py); round,
+        # and null out anything int32 can't hold, so one odd doc can't fail the frame
+        duration = df['duration'].round()
+        df['duration'] = duration.where(duration.abs() < 2**31).astype('int32[pyarrow]')
+    for c in CATEGORY_FIELDS:
+        if c in df.columns:
+            df[c] = df[c].astype('category')
+    # Sorted DatetimeIndex so date windows are binary-search slices; undated calls can't be placed
+    return df.dropna(subset=['callDate']).set_index('callDate').sort_index()
+
+
+def _on_calls_snapshot(docs, changes, read_time):
+    """Merge added/modified/removed calls into the live copy"""
+    global _live_dirty
+    with _calls_lock:
+        for change in changes:
+            if change.type == ChangeType.REMOVED:
+                _live_calls.pop(change.document.id, None)
+            else:
+                data = change.document.to_dict() or {}
+                _live_calls[change.document.id] = {k: data.get(k) for k in CALL_FIELDS}
+        _live_dirty = True
+    _first_snapshot.set()
+
+
+def start_calls_listener():
+    """Subscribe to kixie_calls so refreshes only pay for changed docs"""
+    global _calls_watch
+    if not db:
+        return
+    try:
+        _calls_watch = db.collection('kixie_calls').on_snapshot(_on_calls_snapshot)
+        atexit.register(_calls_watch.unsubscribe)
+    except Exception as e:
+        print(f"Error starting calls listener: {e}")
+        _calls_watch = None
+
+
+def current_calls():
+    """Live calls DataFrame, rebuilt only when the listener has delivered changes"""
+    global df, _live_dirty, _df_version
+    with _calls_lock:
+        if _live_dirty:
+            df = calls_frame(_live_calls.items())
+            _df_version += 1
+            _live_dirty = False
+        return df
+
+
+def filter_by_date(df, start, end):
+    """Restrict calls to the inclusive [start, end] date window"""
+    if df.empty or not (start and end):
+        return df
+    lo, hi = day_window(start, end)
+    # loc slices are end-inclusive; stop just short of the next UTC midnight
+    return df.loc[lo:hi - pd.Timedelta(1, 'ns')]
+
+
+def calls_for_range(start, end, force=False):
+    """Calls in a date window, re-fetched at most once per CACHE_TTL_SECONDS"""
+    global _df_version
+
+    if _calls_watch is not None:
+        return filter_by_date(current_calls(), start, end)
+
+    key = (start, end)
+    with _range_lock:
+        hit = _range_cache.get(key)
+    if hit and not force and time.monotonic() - hit[0] < CACHE_TTL_SECONDS:
+        return hit[1]
+
+    # Range is applied by Firestore, so only matching calls are read; the lock
+    # isn't held here since fetch_calls already shares concurrent streams
+    filtered_df = fetch_calls(start, end)
+    with _range_lock:
+        now = time.monotonic()
+        _df_version += 1
+        # Drop expired windows so old date picks don't pin their frames
+        for k in [k for k, (ts, _) in _range_cache.items() if now - ts >= CACHE_TTL_SECONDS]:
+            del _range_cache[k]
+        _range_cache[key] = (now, filtered_df)
+    return filtered_df
+
+
 # Create Dash app
 app = Dash(__name__)
 
 # Fetch data
 print("Loading call data...")
-df = fetch_calls()
+df = pd.DataFrame()
+start_calls_listener()
+if _calls_watch is not None and _first_snapshot.wait(timeout=60):
+    df = current_calls()
+else:
+    df = fetch_calls()
 
 if df.empty:
-    df = pd.DataFrame(columns=['id', 'agent', 'phoneNumber', 'direction', 'outcome', 
-                               'duration', 'callDate', 'callEndDate', 'receivedAt'])
-
-# Process dates
-if 'callDate' in df.columns and not df.empty:
-    df['callDate'] = pd.to_datetime(df['callDate'], errors='coerce')
-    df['date'] = df['callDate'].dt.date
-elif not df.empty:
-    df['date'] = None
-
-# Get date range for filter
-if not df.empty and 'date' in df.columns:
-    dates = df['date'].dropna().sort_values()
-    if len(dates) > 0:
-        min_date = dates.min()
-        max_date = dates.max()
-    else:
-        min_date = max_date = datetime.now().date()
+    df = calls_frame([])
+
+# Get date range for filter (index is sorted callDate)
+if not df.empty:
+    min_date = df.index[0].date()
+    max_date = df.index[-1].date()
 else:
     min_date = max_date = datetime.now().date()
 
@@ -165,37 +354,32 @@ app.layout = html.Div([
      Input('auto-refresh', 'n_intervals')]
 )
 def update_dashboard(apply_clicks, start_date, end_date, refresh_clicks, auto_refresh):
-    global df
-    
-    # Refresh data if button clicked OR on auto-refresh interval
-    if refresh_clicks > 0 or auto_refresh > 0:
-        df = fetch_calls()
-        if 'callDate' in df.columns and not df.empty:
-            df['callDate'] = pd.to_datetime(df['callDate'], errors='coerce')
-            df['date'] = df['callDate'].dt.date
-    
-    if df.empty:
-        return "0", "0", "0%", "0m", go.Figure(), go.Figure(), "No data"
-    
-    # Filter by date
-    filtered_df = df.copy()
+    start = end = None
     if start_date and end_date:
         start = pd.to_datetime(start_date).date() if isinstance(start_date, str) else start_date
         end = pd.to_datetime(end_date).date() if isinstance(end_date, str) else end_date
-        
-        if 'date' in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df['date'].notna()]
-            filtered_df = filtered_df[(filtered_df['date'] >= start) & (filtered_df['date'] <= end)]
-    
-    # Calculate KPIs
+
+    # Bring the data up to date; figures are only rebuilt if it changed
+    calls_for_range(start, end, force=ctx.triggered_id == 'refresh-btn')
+    return _build_figs(start, end, _df_version)
+
+
+@lru_cache(maxsize=64)
+def _build_figs(start, end, df_version):
+    """All dashboard outputs for a date window at a given data version"""
+    # Rows come from the live listener copy (or a cached re-fetch without one)
+    filtered_df = calls_for_range(start, end)
+
+    if filtered_df.empty:
+        return "0", "0", "0%", "0m", go.Figure(), go.Figure(), "No data"
+
+    # Calculate KPIs from the window's rows, which both the listener and the
+    # re-fetch path already hold, so aggregation queries would only add RPCs
     total_calls = len(filtered_df)
-    
-    # Connection = calls with outcome 'connected' or 'answered'
-    connected_outcomes = ['connected', 'answered', 'success']
-    connections = filtered_df[filtered_df['outcome'].isin(connected_outcomes)].shape[0]
-    
+    connections = int(filtered_df['outcome'].isin(CONNECTED_OUTCOMES).sum())
+
     connection_rate = f"{(connections/total_calls*100):.1f}%" if total_calls > 0 else "0%"
-    
+
     # Total talk time in minutes
     total_duration = filtered_df['duration'].sum() if 'duration' in filtered_df.columns else 0
     talk_minutes = int(total_duration / 60)
@@ -205,7 +389,8 @@ def update_dashboard(apply_clicks, start_date, end_date, refresh_clicks, auto_re
         talk_time = f"{talk_minutes}m"
     
     # Outcome chart
-    outcome_counts = filtered_df['outcome'].value_counts().reset_index()
+    # Categorical value_counts also lists categories with no calls in the window
+    outcome_counts = filtered_df['outcome'].value_counts()[lambda c: c > 0].reset_index()
     outcome_counts.columns = ['Outcome', 'Count']
     fig_outcome = px.pie(outcome_counts, values='Count', names='Outcome',
                         title='Call Outcomes')
@@ -213,7 +398,7 @@ def update_dashboard(apply_clicks, start_date, end_date, refresh_clicks, auto_re
     fig_outcome.update_layout(paper_bgcolor='white')
     
     # Agent chart - calls per agent
-    agent_counts = filtered_df['agent'].value_counts().head(10).reset_index()
+    agent_counts = filtered_df['agent'].value_counts()[lambda c: c > 0].head(10).reset_index()
     agent_counts.columns = ['Agent', 'Calls']
     fig_agent = px.bar(agent_counts, x='Agent', y='Calls',
                      title='Calls by Agent',
@@ -222,44 +407,36 @@ def update_dashboard(apply_clicks, start_date, end_date, refresh_clicks, auto_re
                          xaxis_tickangle=-45)
     
     # Agent table with connections and rate
-    agent_stats = filtered_df.groupby('agent').agg({
-        'id': 'count',
-        'outcome': lambda x: sum(x.isin(connected_outcomes)),
-        'duration': 'sum'
-    }).reset_index()
+    agent_stats = (
+        filtered_df.assign(is_conn=filtered_df['outcome'].isin(CONNECTED_OUTCOMES))
+        .groupby('agent', sort=False, observed=True)
+        .agg(total=('id', 'size'), connections=('is_conn', 'sum'), duration=('duration', 'sum'))
+        .reset_index()
+    )
     agent_stats.columns = ['Agent', 'Total Calls', 'Connections', 'Total Duration']
     
     # Calculate connection rate per agent
-    agent_stats['Connection %'] = agent_stats.apply(
-        lambda r: f"{(r['Connections']/r['Total Calls']*100):.1f}%" if r['Total Calls'] > 0 else "0%",
-        axis=1
-    )
-    agent_stats['Talk Time'] = agent_stats['Total Duration'].apply(
-        lambda x: f"{int(x/60)}m" if x < 3600 else f"{x//60}h {x%60}m"
+    rate = agent_stats['Connections'] / agent_stats['Total Calls'] * 100
+    agent_stats['Connection %'] = rate.fillna(0).map('{:.1f}%'.format)
+    minutes = (agent_stats['Total Duration'].fillna(0) // 60).astype(int)
+    agent_stats['Talk Time'] = np.where(
+        minutes >= 60,
+        (minutes // 60).astype(str) + 'h ' + (minutes % 60).astype(str) + 'm',
+        minutes.astype(str) + 'm'
     )
     
     # Sort by connections
     agent_stats = agent_stats.sort_values('Connections', ascending=False)
     
     # Create table
-    table = html.Table([
-        html.Tr([
-            html.Th('Agent'),
-            html.Th('Total Calls'),
-            html.Th('Connections'),
-            html.Th('Connection %'),
-            html.Th('Talk Time')
-        ])
-    ] + [
-        html.Tr([
-            html.Td(row['Agent']),
-            html.Td(row['Total Calls']),
-            html.Td(row['Connections']),
-            html.Td(row['Connection %']),
-            html.Td(row['Talk Time'])
-        ])
-        for _, row in agent_stats.iterrows()
-    ], style={'width': '100%', 'borderCollapse': 'collapse'})
+    table_cols = ['Agent', 'Total Calls', 'Connections', 'Connection %', 'Talk Time']
+    table = dash_table.DataTable(
+        data=agent_stats[table_cols].to_dict('records'),
+        columns=[{'name': c, 'id': c} for c in table_cols],
+        page_size=25,
+        style_header={'backgroundColor': '#2980b9', 'color': 'white', 'fontWeight': 'bold'},
+        style_cell={'textAlign': 'left', 'padding': '10px'}
+    )
     
     return (
         str(total_calls),
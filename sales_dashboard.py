@@ -2,14 +2,29 @@
 Happy Solar Sales Dashboard - Opportunities Focus
 Plotly Dash - Connects to Firestore
 """
+import atexit
 import json
 import os
-from dash import Dash, html, dcc, callback, Output, Input
+import threading
+from concurrent.futures import Future
+from dash import Dash, html, dcc, dash_table, callback, ctx, Output, Input
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
 from google.cloud import firestore
+from google.cloud.firestore_v1.watch import ChangeType
+
+try:
+    import pyarrow  # noqa: F401  (optional: Arrow-backed string/int columns)
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: no cross-worker sharing
+    fcntl = None
 
 SERVICE_ACCOUNT_PATH = os.path.join(os.path.dirname(__file__), 'firebase-key.json')
 
@@ -21,21 +36,55 @@ except Exception as e:
     print(f"Firebase error: {e}")
     db = None
 
+# Fields the dashboard actually reads; everything else stays server-side
+CONTACT_FIELDS = ['firstName', 'lastName', 'phone', 'team', 'rep', 'leadSource', 'setter', 'tags', 'syncedAt']
+
+# Low-cardinality string columns stored as pandas categoricals
+CATEGORY_FIELDS = ('team', 'rep', 'leadSource', 'setter', 'type')
+
+# Free-text columns stored as Arrow strings when pyarrow is available
+ARROW_FIELDS = ['id', 'firstName', 'lastName', 'phone']
+
+# Live copy of ghl_contacts maintained by a Firestore snapshot listener
+_contacts_lock = threading.Lock()
+_live_contacts = {}
+_live_dirty = False
+_first_snapshot = threading.Event()
+_contacts_watch = None
+_start_lock = threading.Lock()
+
+# First render waits this long for the initial snapshot (under gunicorn's 30s timeout)
+FIRST_SNAPSHOT_TIMEOUT = 20
+
+# In-flight Firestore fetches, so concurrent refreshes share one stream
+_fetch_lock = threading.Lock()
+_inflight = {}
+
+# One worker per host owns Firestore reads and publishes a parquet snapshot to
+# /dev/shm; the other gunicorn workers load their own copy from it instead of
+# streaming the collection again (saves Firestore reads, not worker memory)
+SHARED_SNAPSHOT = os.environ.get('CONTACTS_SNAPSHOT_PATH', '/dev/shm/happy-solar-contacts.parquet')
+# Left by a writer that couldn't publish, so readers go back to their own reads
+SHARED_DISABLED = SHARED_SNAPSHOT + '.disabled'
+_share = fcntl is not None and HAS_PYARROW
+_writer_lock = None
+_shared_mtime = None
+
 
 def fetch_contacts():
     """Fetch all contacts from Firestore"""
+    return single_flight('ghl_contacts', _stream_contacts)
+
+
+def _stream_contacts():
     if not db:
         return pd.DataFrame()
     
     try:
-        docs = db.collection('ghl_contacts').stream()
-        contacts = []
-        for doc in docs:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            contacts.append(data)
-        
-        df = pd.DataFrame(contacts)
+        # stream() is a single server-streamed RunQuery RPC, not paged requests,
+        # so keeping the projection small is what cuts wire time here
+        docs = db.collection('ghl_contacts').select(CONTACT_FIELDS).stream()
+        df = contacts_frame((doc.id, doc.to_dict()) for doc in docs)
         print(f"Loaded {len(df)} contacts from Firestore")
         return df
     except Exception as e:
@@ -43,19 +92,209 @@ def fetch_contacts():
         return pd.DataFrame()
 
 
+def single_flight(key, fn):
+    """Run fn once for concurrent callers with the same key; all of them share its result"""
+    with _fetch_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        return future.result()
+
+    try:
+        future.set_result(fn())
+    except Exception as e:
+        future.set_exception(e)
+    finally:
+        with _fetch_lock:
+            _inflight.pop(key, None)
+    return future.result()
+
+
+def contacts_frame(records):
+    """Build the contacts DataFrame from (doc id, fields) pairs"""
+    # Column lists (not row dicts) so pandas skips the per-row schema union
+    cols = {k: [] for k in ['id'] + CONTACT_FIELDS}
+    for doc_id, data in records:
+        cols['id'].append(doc_id)
+        for k in CONTACT_FIELDS:
+            cols[k].append(data.get(k))
+
+    # GHL fields aren't consistently typed (int vs str phones/teams, non-str tags),
+    # so coerce the raw values to one type per column for Arrow and the parquet
+    # snapshot; done before pandas turns gaps into NaN and ints into floats
+    for c in ARROW_FIELDS + list(CATEGORY_FIELDS):
+        if c in cols:
+            cols[c] = [v if v is None or isinstance(v, str) else str(v) for v in cols[c]]
+    cols['tags'] = [
+        None if t is None else [str(x) for x in (t if isinstance(t, list) else [t])]
+        for t in cols['tags']
+    ]
+
+    df = pd.DataFrame(cols, copy=False)
+    df['syncedAt'] = pd.to_datetime(df['syncedAt'], errors='coerce', utc=True)
+    if HAS_PYARROW:
+        df[ARROW_FIELDS] = df[ARROW_FIELDS].convert_dtypes(dtype_backend='pyarrow')
+    for c in CATEGORY_FIELDS:
+        if c in df.columns:
+            df[c] = df[c].astype('category')
+    return df
+
+
+def _on_contacts_snapshot(docs, changes, read_time):
+    """Merge added/modified/removed contacts into the live copy"""
+    global _live_dirty
+    with _contacts_lock:
+        for change in changes:
+            if change.type == ChangeType.REMOVED:
+                _live_contacts.pop(change.document.id, None)
+            else:
+                data = change.document.to_dict() or {}
+                _live_contacts[change.document.id] = {k: data.get(k) for k in CONTACT_FIELDS}
+        _live_dirty = True
+    _first_snapshot.set()
+    if _share:
+        # Readers only see what is published, so rebuild now rather than on render
+        current_contacts()
+
+
+def start_contacts_listener():
+    """Subscribe to ghl_contacts so refreshes only pay for changed docs"""
+    global _contacts_watch
+    if not db:
+        return
+    try:
+        _contacts_watch = db.collection('ghl_contacts').on_snapshot(_on_contacts_snapshot)
+        atexit.register(_contacts_watch.unsubscribe)
+    except Exception as e:
+        print(f"Error starting contacts listener: {e}")
+        _contacts_watch = None
+
+
+def current_contacts():
+    """Live contacts DataFrame, rebuilt only when the listener has delivered changes"""
+    global df, _live_dirty
+    with _contacts_lock:
+        if _live_dirty:
+            df = contacts_frame(_live_contacts.items())
+            _live_dirty = False
+            publish_contacts(df)
+        return df
+
+
+def claim_writer():
+    """True if this process should read Firestore itself (holds the per-host lock)"""
+    global _writer_lock, _share
+    if _writer_lock is not None:
+        return True
+    if not _share:
+        _writer_lock = True
+        return True
+    try:
+        lock = open(SHARED_SNAPSHOT + '.lock', 'w')
+    except OSError:
+        # Nowhere to share through (e.g. no /dev/shm); every worker reads for itself
+        _share = False
+        _writer_lock = True
+        return True
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        # The live writer couldn't publish; read Firestore ourselves instead
+        if os.path.exists(SHARED_DISABLED):
+            _share = False
+            _writer_lock = True
+            return True
+        return False
+    _writer_lock = lock
+    # A new writer starts fresh, whatever the previous one left behind
+    try:
+        os.remove(SHARED_DISABLED)
+    except OSError:
+        pass
+    return True
+
+
+def publish_contacts(df):
+    """Atomically replace the shared snapshot with df"""
+    global _share
+    if not _share:
+        return
+    tmp = f"{SHARED_SNAPSHOT}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, SHARED_SNAPSHOT)
+    except Exception as e:
+        print(f"Error publishing contacts snapshot, readers will fetch for themselves: {e}")
+        _share = False
+        for path in (tmp, SHARED_SNAPSHOT):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        try:
+            open(SHARED_DISABLED, 'w').close()
+        except OSError:
+            pass
+
+
+def read_shared_contacts():
+    """Latest snapshot published by the writer worker, re-read only when it changes"""
+    global df, _shared_mtime
+    try:
+        mtime = os.stat(SHARED_SNAPSHOT).st_mtime_ns
+    except OSError:
+        return df
+    if mtime != _shared_mtime:
+        try:
+            df = pd.read_parquet(SHARED_SNAPSHOT)
+            _shared_mtime = mtime
+        except Exception as e:
+            print(f"Error reading contacts snapshot: {e}")
+    return df
+
+
+def load_contacts(refresh=False):
+    """Contacts for a render: live or fetched in the writer, the shared snapshot elsewhere"""
+    global df, _fetched, _listening
+    if not claim_writer():
+        return read_shared_contacts()
+
+    # Start the listener and wait for its first snapshot once, not on every render
+    with _start_lock:
+        if not _listening:
+            _listening = True
+            start_contacts_listener()
+            if _contacts_watch is not None and not _first_snapshot.wait(timeout=FIRST_SNAPSHOT_TIMEOUT):
+                print("Contacts listener slow to start; fetching once")
+
+    # The listener keeps df current once it has delivered; until then, fetch
+    if _contacts_watch is None or not _first_snapshot.is_set():
+        if refresh or not _fetched:
+            fetched = fetch_contacts()
+            _fetched = True
+            with _contacts_lock:
+                # Don't overwrite a snapshot that arrived while we were fetching
+                if not _first_snapshot.is_set():
+                    df = fetched
+                    publish_contacts(df)
+    if _contacts_watch is not None and _first_snapshot.is_set():
+        return current_contacts()
+    return df
+
+
 # Create Dash app
 app = Dash(__name__)
 
-# Fetch data
-print("Loading data...")
-try:
-    df = fetch_contacts()
-except:
-    df = pd.DataFrame()
+EMPTY_COLUMNS = ['id', 'firstName', 'lastName', 'phone', 'email', 'team', 'rep',
+                 'leadSource', 'type', 'syncedAt', 'setter', 'tags']
 
-if df.empty:
-    df = pd.DataFrame(columns=['id', 'firstName', 'lastName', 'phone', 'email', 'team', 'rep', 
-                               'leadSource', 'type', 'syncedAt', 'setter', 'tags'])
+# Data loads on first render (not at import, so forked workers don't share a listener)
+df = pd.DataFrame(columns=EMPTY_COLUMNS)
+_fetched = False
+_listening = False
 
 
 # Layout
@@ -70,22 +309,22 @@ app.layout = html.Div([
     html.Div([
         html.Div([
             html.H3("Total Opportunities", style={'margin': '0', 'color': '#7f8c8d'}),
-            html.H2(f"{len(df):,}", style={'margin': '0', 'color': '#2980b9'})
+            html.H2('—', id='total-opps', style={'margin': '0', 'color': '#2980b9'})
         ], className="kpi-card"),
         
         html.Div([
             html.H3("With Setter", style={'margin': '0', 'color': '#7f8c8d'}),
-            html.H2(f"{df['setter'].notna().sum():,}", style={'margin': '0', 'color': '#27ae60'})
+            html.H2('—', id='with-setter', style={'margin': '0', 'color': '#27ae60'})
         ], className="kpi-card"),
         
         html.Div([
             html.H3("Unique Setters", style={'margin': '0', 'color': '#7f8c8d'}),
-            html.H2(f"{df['setter'].nunique():,}", style={'margin': '0', 'color': '#8e44ad'})
+            html.H2('—', id='unique-setters', style={'margin': '0', 'color': '#8e44ad'})
         ], className="kpi-card"),
         
         html.Div([
             html.H3("Teams Active", style={'margin': '0', 'color': '#7f8c8d'}),
-            html.H2(f"{df['team'].nunique():,}", style={'margin': '0', 'color': '#e67e22'})
+            html.H2('—', id='teams-active', style={'margin': '0', 'color': '#e67e22'})
         ], className="kpi-card"),
     ], className="kpi-row"),
     
@@ -134,7 +373,8 @@ app.layout = html.Div([
                    style={'padding': '12px 24px', 'fontSize': '14px', 
                           'backgroundColor': '#2980b9', 'color': 'white',
                           'border': 'none', 'borderRadius': '5px', 'cursor': 'pointer',
-                          'marginTop': '20px'})
+                          'marginTop': '20px'}),
+        dcc.Interval(id='auto-refresh', interval=30*1000, n_intervals=0)  # Recompute from live data every 30 seconds
     ], style={'textAlign': 'center', 'marginTop': '20px'}),
     
 ], style={'padding': '20px', 'fontFamily': 'Arial, sans-serif',
@@ -143,21 +383,33 @@ app.layout = html.Div([
 
 # Callbacks
 @callback(
-    [Output('setter-chart', 'figure'),
+    [Output('total-opps', 'children'),
+     Output('with-setter', 'children'),
+     Output('unique-setters', 'children'),
+     Output('teams-active', 'children'),
+     Output('setter-chart', 'figure'),
      Output('team-chart', 'figure'),
      Output('source-chart', 'figure'),
      Output('pipeline-chart', 'figure'),
      Output('rep-chart', 'figure'),
      Output('conversion-chart', 'figure'),
      Output('contacts-table', 'children')],
-    [Input('refresh-btn', 'n_clicks')]
+    [Input('refresh-btn', 'n_clicks'),
+     Input('auto-refresh', 'n_intervals')]
 )
-def update_dashboard(n_clicks):
-    global df
+def update_dashboard(n_clicks, n_intervals):
+    # Local frame: module df belongs to current_contacts()/read_shared_contacts(),
+    # and assigning it here could overwrite a rebuild from the listener thread
+    df = load_contacts(refresh=ctx.triggered_id == 'refresh-btn')
+    
+    if df.empty:
+        df = pd.DataFrame(columns=EMPTY_COLUMNS)
     
-    # Re-fetch on refresh
-    if n_clicks > 0:
-        df = fetch_contacts()
+    # KPIs
+    total_opps = f"{len(df):,}"
+    with_setter = f"{df['setter'].notna().sum():,}"
+    unique_setters = f"{df['setter'].nunique():,}"
+    teams_active = f"{df['team'].nunique():,}"
     
     # 1. Opportunities by Setter (top 15)
     setter_counts = df['setter'].value_counts().head(15).reset_index()
@@ -186,12 +438,7 @@ def update_dashboard(n_clicks):
     
     # 4. Pipeline Stage (from tags)
     # Extract pipeline stage from tags
-    all_tags = []
-    for tags in df['tags'].dropna():
-        all_tags.extend(tags)
-    
-    tag_series = pd.Series(all_tags)
-    tag_counts = tag_series.value_counts().head(12).reset_index()
+    tag_counts = df['tags'].dropna().explode().value_counts().head(12).reset_index()
     tag_counts.columns = ['Stage', 'Count']
     
     fig_pipeline = px.funnel(tag_counts, x='Count', y='Stage',
@@ -209,7 +456,7 @@ def update_dashboard(n_clicks):
     
     # 6. Lead Source by Team (stacked bar)
     if not df['team'].empty and not df['leadSource'].empty:
-        source_team = df.groupby(['leadSource', 'team']).size().reset_index(name='Count')
+        source_team = df.groupby(['leadSource', 'team'], observed=True).size().reset_index(name='Count')
         fig_conversion = px.bar(source_team, x='leadSource', y='Count', color='team',
                               title='Lead Sources by Team',
                               barmode='group')
@@ -222,14 +469,16 @@ def update_dashboard(n_clicks):
     # 7. Sample table - show key opportunity fields
     sample = df[df['setter'].notna()][['firstName', 'lastName', 'phone', 'team', 'setter', 'leadSource']].head(25)
     
-    table = html.Table([
-        html.Tr([html.Th(col.title()) for col in sample.columns])
-    ] + [
-        html.Tr([html.Td(str(sample.iloc[i][col])) for col in sample.columns])
-        for i in range(len(sample))
-    ], style={'width': '100%', 'borderCollapse': 'collapse', 'fontSize': '13px'})
+    table = dash_table.DataTable(
+        data=sample.astype(str).fillna('').to_dict('records'),
+        columns=[{'name': col.title(), 'id': col} for col in sample.columns],
+        page_size=25,
+        style_header={'backgroundColor': '#2980b9', 'color': 'white', 'fontWeight': 'bold'},
+        style_cell={'textAlign': 'left', 'padding': '10px', 'fontSize': '13px'}
+    )
     
-    return fig_setter, fig_team, fig_source, fig_pipeline, fig_rep, fig_conversion, table
+    return (total_opps, with_setter, unique_setters, teams_active,
+            fig_setter, fig_team, fig_source, fig_pipeline, fig_rep, fig_conversion, table)
 
 
 # Add CSS